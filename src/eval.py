@@ -1,10 +1,266 @@
+import importlib.util
 import os
-from typing import Dict, List
-from sentence_transformers import CrossEncoder, SentenceTransformer
-from sklearn.metrics.pairwise import cosine_similarity
-from dotenv import load_dotenv
+import platform
+import sys
+from collections import OrderedDict
+from contextlib import contextmanager
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, List, Tuple
 
-load_dotenv()
+import numpy as np
+
+GROUNDEDNESS_MODEL_ID = 'cross-encoder/nli-deberta-v3-small'
+RELEVANCE_MODEL_ID = 'sentence-transformers/all-MiniLM-L6-v2'
+
+# Quantized ONNX exports are cached here so only the first run pays the export cost
+ONNX_CACHE_DIR = Path.home() / ".cache" / "brsr"
+ONNX_INT8_FILE = "model_quantized.onnx"
+
+
+@lru_cache(maxsize=None)
+def _quantization_target() -> str:
+    """
+    Picks the ORT dynamic-quantization preset for this CPU. The avx512_vnni preset's U8S8
+    format can saturate on CPUs without VNNI, so everything else gets a safer preset.
+    """
+    machine = platform.machine().lower()
+    if machine in ("arm64", "aarch64"):
+        return "arm64"
+    try:
+        with open("/proc/cpuinfo", encoding="utf-8") as f:
+            if "avx512_vnni" in f.read():
+                return "avx512_vnni"
+    except OSError:
+        # No /proc/cpuinfo (macOS / Windows): assume no VNNI
+        pass
+    return "avx2"
+
+
+def _quantization_config(target: str):
+    from optimum.onnxruntime.configuration import AutoQuantizationConfig
+
+    if target == "avx512_vnni":
+        return AutoQuantizationConfig.avx512_vnni(is_static=False, per_channel=False)
+    if target == "arm64":
+        return AutoQuantizationConfig.arm64(is_static=False, per_channel=False)
+    # reduce_range (7-bit weights) avoids U8S8 saturation without VNNI
+    return AutoQuantizationConfig.avx2(is_static=False, per_channel=False, reduce_range=True)
+
+
+def _export_onnx_int8(model_id: str, out_path: Path, model_cls=None) -> Path:
+    """
+    Exports a HF model to ONNX and applies dynamic INT8 quantization.
+    No-op if the quantized model already exists in `out_path`.
+    """
+    out_path = Path(out_path)
+    if (out_path / ONNX_INT8_FILE).exists():
+        return out_path
+
+    from optimum.onnxruntime import ORTModelForSequenceClassification, ORTQuantizer
+    from transformers import AutoTokenizer
+
+    model_cls = model_cls or ORTModelForSequenceClassification
+
+    print(f"⚙️ Exporting {model_id} to ONNX (INT8)...")
+    model = model_cls.from_pretrained(model_id, export=True)
+    model.save_pretrained(out_path)
+    AutoTokenizer.from_pretrained(model_id).save_pretrained(out_path)
+
+    quantizer = ORTQuantizer.from_pretrained(model)
+    quantizer.quantize(save_dir=out_path, quantization_config=_quantization_config(_quantization_target()))
+    return out_path
+
+
+class _CrossEncoderShim:
+    """
+    Minimal CrossEncoder.predict(): tokenizes pairs batch-padded, returns logits as numpy.
+    Subclasses provide the tokenizer, model and _logits() for their runtime.
+    """
+    return_tensors = "np"
+
+    def predict(self, pairs: List[Tuple[str, str]], batch_size: int = 32, **kwargs) -> np.ndarray:
+        logits = []
+        for start in range(0, len(pairs), batch_size):
+            batch = pairs[start:start + batch_size]
+            features = self.tokenizer(
+                [a for a, _ in batch], [b for _, b in batch],
+                padding=True, truncation=True, return_tensors=self.return_tensors
+            )
+            logits.append(self._logits(features))
+        return np.concatenate(logits)
+
+
+class _SentenceEncoderShim:
+    """
+    Minimal SentenceTransformer.encode() for all-MiniLM-L6-v2: mean pooling over the attention mask.
+    Subclasses provide the tokenizer, model and _hidden() for their runtime.
+    """
+    return_tensors = "np"
+    # all-MiniLM-L6-v2's sentence-transformers config truncates at 256 tokens (tokenizer default is 512)
+    max_seq_length = 256
+
+    def encode(self, sentences, batch_size: int = 32, normalize_embeddings: bool = False, **kwargs) -> np.ndarray:
+        if isinstance(sentences, str):
+            return self.encode([sentences], batch_size, normalize_embeddings)[0]
+
+        embeddings = []
+        for start in range(0, len(sentences), batch_size):
+            features = self.tokenizer(
+                sentences[start:start + batch_size],
+                padding=True, truncation=True, max_length=self.max_seq_length,
+                return_tensors=self.return_tensors
+            )
+            hidden = self._hidden(features)
+            mask = np.asarray(features["attention_mask"])[..., None].astype(hidden.dtype)
+            embeddings.append((hidden * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None))
+
+        embeddings = np.concatenate(embeddings)
+        if normalize_embeddings:
+            embeddings = embeddings / np.linalg.norm(embeddings, axis=1, keepdims=True)
+        return embeddings
+
+
+class _OnnxCrossEncoder(_CrossEncoderShim):
+    """
+    Cross-encoder backed by an INT8 ONNX Runtime session.
+    """
+
+    def __init__(self, model_dir: Path):
+        from optimum.onnxruntime import ORTModelForSequenceClassification
+        from transformers import AutoTokenizer
+
+        self.tokenizer = AutoTokenizer.from_pretrained(model_dir)
+        self.model = ORTModelForSequenceClassification.from_pretrained(model_dir, file_name=ONNX_INT8_FILE)
+
+    def _logits(self, features) -> np.ndarray:
+        return self.model(**features).logits
+
+
+class _OnnxSentenceEncoder(_SentenceEncoderShim):
+    """
+    Sentence encoder backed by an INT8 ONNX Runtime session.
+    """
+
+    def __init__(self, model_dir: Path):
+        from optimum.onnxruntime import ORTModelForFeatureExtraction
+        from transformers import AutoTokenizer
+
+        self.tokenizer = AutoTokenizer.from_pretrained(model_dir)
+        self.model = ORTModelForFeatureExtraction.from_pretrained(model_dir, file_name=ONNX_INT8_FILE)
+
+    def _hidden(self, features) -> np.ndarray:
+        return self.model(**features).last_hidden_state
+
+
+# PyTorch path: plain transformers models loaded with low_cpu_mem_usage, which reads safetensors
+# weights via mmap instead of first materialising a randomly initialised copy (lower peak RAM).
+
+def _use_low_precision() -> bool:
+    # On by default for Apple Silicon only; elsewhere (incl. Linux aarch64 like Graviton2 / Altra,
+    # which lack BF16 units and would emulate it) it is opt-in
+    default = "1" if sys.platform == "darwin" and platform.machine() == "arm64" else "0"
+    return os.getenv("BRSR_FP16", default) == "1"
+
+
+@contextmanager
+def _torch_inference(low_precision: bool):
+    import torch
+
+    # BF16 shifts outputs slightly; acceptable since drift labels are a 3-way argmax
+    with torch.inference_mode(), torch.autocast("cpu", dtype=torch.bfloat16, enabled=low_precision):
+        yield
+
+
+class _TorchCrossEncoder(_CrossEncoderShim):
+    return_tensors = "pt"
+
+    def __init__(self, model_id: str):
+        import torch
+        from transformers import AutoModelForSequenceClassification, AutoTokenizer
+
+        self.tokenizer = AutoTokenizer.from_pretrained(model_id)
+        self.model = AutoModelForSequenceClassification.from_pretrained(
+            model_id, torch_dtype=torch.float32, low_cpu_mem_usage=True
+        ).eval()
+        self.low_precision = _use_low_precision()
+
+    def _logits(self, features) -> np.ndarray:
+        with _torch_inference(self.low_precision):
+            return self.model(**features).logits.float().numpy()
+
+
+class _TorchSentenceEncoder(_SentenceEncoderShim):
+    return_tensors = "pt"
+
+    def __init__(self, model_id: str):
+        import torch
+        from transformers import AutoModel, AutoTokenizer
+
+        self.tokenizer = AutoTokenizer.from_pretrained(model_id)
+        self.model = AutoModel.from_pretrained(
+            model_id, torch_dtype=torch.float32, low_cpu_mem_usage=True
+        ).eval()
+        self.low_precision = _use_low_precision()
+
+    def _hidden(self, features) -> np.ndarray:
+        with _torch_inference(self.low_precision):
+            return self.model(**features).last_hidden_state.float().numpy()
+
+
+@lru_cache(maxsize=None)
+def _configure_runtime() -> None:
+    """
+    One-time process setup, deferred until the first model load so importing this
+    module stays cheap (torch/transformers are only imported on demand).
+    """
+    # CPU thread tuning: intra-op threads default to the physical core count (~half the logical CPUs).
+    threads = int(os.environ.get("BRSR_TORCH_THREADS", max(1, (os.cpu_count() or 2) // 2)))
+
+    # Faster first-time model download, only if the Rust downloader is installed (the hub errors otherwise)
+    if importlib.util.find_spec("hf_transfer") is not None:
+        os.environ.setdefault("HF_HUB_ENABLE_HF_TRANSFER", "1")
+
+    import torch
+
+    torch.set_num_threads(threads)
+    try:
+        torch.set_num_interop_threads(1)
+    except RuntimeError:
+        # Can only be set once per process (e.g. torch already used elsewhere)
+        pass
+
+
+def _use_onnx() -> bool:
+    return os.getenv("BRSR_ONNX_INT8", "1") == "1"
+
+
+def _onnx_dir(model_id: str) -> Path:
+    # Preset is part of the cache key so a config change never reuses a stale export
+    return ONNX_CACHE_DIR / f"{model_id.replace('/', '--')}-int8-{_quantization_target()}"
+
+
+def _load_groundedness_model():
+    _configure_runtime()
+    if _use_onnx():
+        try:
+            return _OnnxCrossEncoder(_export_onnx_int8(GROUNDEDNESS_MODEL_ID, _onnx_dir(GROUNDEDNESS_MODEL_ID)))
+        except Exception as e:
+            print(f"⚠️ Warning: ONNX INT8 load failed, falling back to PyTorch: {e}")
+    return _TorchCrossEncoder(GROUNDEDNESS_MODEL_ID)
+
+
+def _load_relevance_model():
+    _configure_runtime()
+    if _use_onnx():
+        try:
+            from optimum.onnxruntime import ORTModelForFeatureExtraction
+
+            model_dir = _export_onnx_int8(RELEVANCE_MODEL_ID, _onnx_dir(RELEVANCE_MODEL_ID), ORTModelForFeatureExtraction)
+            return _OnnxSentenceEncoder(model_dir)
+        except Exception as e:
+            print(f"⚠️ Warning: ONNX INT8 load failed, falling back to PyTorch: {e}")
+    return _TorchSentenceEncoder(RELEVANCE_MODEL_ID)
 
 class EvaluationEngine:
     """
@@ -14,13 +270,54 @@ class EvaluationEngine:
     2. Relevance: How semantically close is the Evidence to the Principle 6 Requirement?
     """
     
+    # NLI label order for 'nli-deberta-v3-small', and the drift score each label maps to
+    _LABELS = ('contradiction', 'entailment', 'neutral')
+    _DRIFT_LUT = np.array([3, 0, 2], dtype=np.int8)
+    
+    # Per-cache entry limit (LRU eviction) so long-lived engines auditing many companies stay bounded
+    _CACHE_MAX = 4096
+    
     def __init__(self):
-        # Load local models (Cached)
+        # Local models are loaded on first use, so callers only pay for the head they need
         # Using lighter models for dev speed as per Compatibility Matrix
-        self.groundedness_model = CrossEncoder('cross-encoder/nli-deberta-v3-small')
-        self.relevance_model = SentenceTransformer('all-MiniLM-L6-v2')
+        # INT8 ONNX Runtime by default (set BRSR_ONNX_INT8=0 for plain PyTorch)
+        self._groundedness_model = None
+        self._relevance_model = None
+        # Requirement strings repeat across calls/companies: LRU-cache model outputs (bounded by _CACHE_MAX)
+        self._emb_cache: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._score_cache: "OrderedDict[Tuple[str, str], np.ndarray]" = OrderedDict()
+
+    @property
+    def groundedness_model(self):
+        if self._groundedness_model is None:
+            self._groundedness_model = _load_groundedness_model()
+        return self._groundedness_model
+
+    @property
+    def relevance_model(self):
+        if self._relevance_model is None:
+            self._relevance_model = _load_relevance_model()
+        return self._relevance_model
+
+    def _cached(self, cache: OrderedDict, keys: list, compute) -> list:
+        """
+        Returns cache[k] for each key, calling compute(misses) once for all unseen keys.
+        Hits are refreshed and the oldest entries evicted past _CACHE_MAX.
+        """
+        found = {}
+        for k in dict.fromkeys(keys):
+            if k in cache:
+                cache.move_to_end(k)
+                found[k] = cache[k]
+        missing = [k for k in dict.fromkeys(keys) if k not in found]
+        if missing:
+            for k, value in zip(missing, compute(missing)):
+                found[k] = cache[k] = value
+            while len(cache) > self._CACHE_MAX:
+                cache.popitem(last=False)
+        return [found[k] for k in keys]
         
-    def calculate_drift(self, claim: str, evidence: str) -> Dict[str, float]:
+    def calculate_drift(self, claim: str, evidence: str, return_logits: bool = False) -> Dict[str, float]:
         """
         Calculates Drift Score (0-3).
         
@@ -29,53 +326,69 @@ class EvaluationEngine:
         - Medium Entailment (0.3 < Groundedness < 0.8) -> Score 1 (Paraphrased)
         - Low Entailment / Neutral -> Score 2 (Abstract)
         - Contradiction / Low Relevance -> Score 3 (Drift/Hallucination)
+        
+        Raw NLI logits are only included (as "groundedness_logits") when return_logits=True.
+        """
+        return self.calculate_drift_batch([(claim, evidence)], return_logits=return_logits)[0]
+
+    def calculate_drift_batch(self, pairs: List[Tuple[str, str]], return_logits: bool = False) -> List[Dict[str, float]]:
+        """
+        Batched variant of calculate_drift.
+        `pairs` holds (claim, evidence) tuples in the same order as calculate_drift's arguments;
+        all of them go through the cross-encoder in a single predict() call.
         """
+        if not pairs:
+            return []
         
         # 1. Groundedness (NLI)
         # Model outputs logits for [Contradiction, Entailment, Neutral] usually
         # We need to check specific model label mapping. 
         # For 'nli-deberta-v3-small': Label 0: Contradiction, 1: Entailment, 2: Neutral
         
-        scores = self.groundedness_model.predict([(evidence, claim)])[0]
+        # Only unseen (evidence, claim) pairs go through the model, still as one batch
+        all_scores = np.stack(self._cached(
+            self._score_cache,
+            [(evidence, claim) for claim, evidence in pairs],
+            lambda missing: self.groundedness_model.predict(missing, batch_size=16, show_progress_bar=False)
+        ))
         # Softmax not strictly needed if we just want argmax, but good for thresholds
-        # Let's map roughly:
-        contradiction, entailment, neutral = scores # Unpacked logic depends on model, verifying assumption...
-        # Actually nli-deberta-v3-small output is 3 classes.
-        
-        # Simpler proxy for assignment "Drift":
-        # If Entailment is high, Drift is 0.
+        # Simpler proxy for assignment "Drift": label -> score via _DRIFT_LUT (Entailment -> 0)
+        pred_label_ids = np.argmax(all_scores, axis=1)
+        drift_scores = self._DRIFT_LUT[pred_label_ids]
         
-        label_mapping = ['contradiction', 'entailment', 'neutral']
-        pred_label_id = scores.argmax()
-        pred_label = label_mapping[pred_label_id]
-        
-        drift_score = 3 # Default bad
-        
-        if pred_label == 'entailment':
-            drift_score = 0
-        elif pred_label == 'neutral':
-            drift_score = 2
-        elif pred_label == 'contradiction':
-            drift_score = 3
-            
-        return {
-            "drift_score": drift_score,
-            "groundedness_logits": scores.tolist(),
-            "label": pred_label
-        }
+        results = [
+            {"drift_score": int(drift_score), "label": self._LABELS[label_id]}
+            for label_id, drift_score in zip(pred_label_ids, drift_scores)
+        ]
+        if return_logits:
+            # Row views into all_scores (no copy); callers that serialize can .tolist() them
+            for res, scores in zip(results, all_scores):
+                res["groundedness_logits"] = scores
+        return results
 
     def compute_relevance(self, requirement: str, disclosure: str) -> float:
         """
         Cosine similarity between SEBI Requirement and Company Disclosure.
+        Uncached texts are encoded in one forward pass; with normalized embeddings
+        the cosine reduces to a dot product.
         """
-        emb_req = self.relevance_model.encode(requirement)
-        emb_dis = self.relevance_model.encode(disclosure)
-        
-        # Reshape for sklearn
-        similarity = cosine_similarity([emb_req], [emb_dis])[0][0]
-        return float(similarity)
+        emb_req, emb_dis = self._cached(
+            self._emb_cache,
+            [requirement, disclosure],
+            lambda missing: self.relevance_model.encode(
+                missing,
+                batch_size=32,
+                convert_to_numpy=True,
+                normalize_embeddings=True
+            )
+        )
+        return float(np.dot(emb_req, emb_dis))
 
 if __name__ == "__main__":
+    from dotenv import load_dotenv
+
+    load_dotenv()
+
     # Smoke Test
     engine = EvaluationEngine()
     print("✅ Eval Models Loaded.")
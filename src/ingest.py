@@ -1,14 +1,49 @@
+import hashlib
+import json
+import multiprocessing
 import os
-from typing import List
-from langchain_community.document_loaders import PyPDFLoader
-from langchain_text_splitters import RecursiveCharacterTextSplitter
-from langchain_openai import ChatOpenAI
-from langchain_core.prompts import ChatPromptTemplate
-from dotenv import load_dotenv
+import re
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from itertools import repeat
+from pathlib import Path
+from typing import List, Optional, Tuple, Union
+
+from pydantic import ValidationError
 
 from src.schema import Principle6Schema
 
-load_dotenv()
+# Serial PDFium extraction runs at ~2.6 ms/page, while a spawned worker costs ~100-250 ms to
+# start (interpreter + imports + reopening the PDF). Each worker therefore needs a block of
+# PAGES_PER_WORKER pages to pay for itself, and small reports stay serial.
+PAGES_PER_WORKER = 100
+PARALLEL_MIN_PAGES = 2 * PAGES_PER_WORKER
+
+
+def _page_text(pdf, page_idx: int) -> str:
+    page = pdf[page_idx]
+    textpage = page.get_textpage()
+    text = textpage.get_text_range()
+    textpage.close()
+    page.close()
+    # PDFium emits CRLF line endings and U+FFFE soft-hyphen markers; pypdf produced neither
+    return text.replace("\r\n", "\n").replace("\ufffe", "")
+
+
+@lru_cache(maxsize=1)
+def _open_pdf(pdf_path: str):
+    import pypdfium2 as pdfium
+
+    # One handle per worker process, reused across the pages it is given
+    return pdfium.PdfDocument(pdf_path)
+
+
+def _extract_page(pdf_path: str, page_idx: int) -> Tuple[int, str]:
+    """
+    Process-pool worker (top-level so it pickles): returns (page index, page text).
+    """
+    return page_idx, _page_text(_open_pdf(pdf_path), page_idx)
+
 
 class IngestionEngine:
     """
@@ -21,12 +56,16 @@ class IngestionEngine:
         self.chunk_size = 2000
         self.chunk_overlap = 200
         self._extractor = None
+        # Content-addressed cache of extraction results (skips the LLM call on re-runs)
+        self.cache_dir = Path(".cache/extractions")
 
     @property
     def extractor(self):
         if self._extractor is None:
             # Initialize LLM with structured output capability only when needed
             try:
+                from langchain_openai import ChatOpenAI
+
                 llm = ChatOpenAI(model=self.model_name, temperature=0)
                 self._extractor = llm.with_structured_output(Principle6Schema)
             except Exception as e:
@@ -34,22 +73,56 @@ class IngestionEngine:
                 return None
         return self._extractor
 
-    def load_and_chunk(self, pdf_path: str) -> List[dict]:
+    def load_and_chunk(self, pdf_path: str, keyword_filter: Optional[Union[List[str], re.Pattern]] = None) -> List[dict]:
         """
         Loads a PDF and splits it into chunks with metadata (Page numbers).
         CalQuity-style: Preserves page numbers for citation.
+        
+        keyword_filter: optional compiled regex, or list of plain keywords (matched as
+        case-insensitive substrings). Pages with no match are dropped before splitting.
         """
+        import pypdfium2 as pdfium
+        from langchain_text_splitters import RecursiveCharacterTextSplitter
+
         print(f"📄 Loading PDF: {pdf_path}")
-        loader = PyPDFLoader(pdf_path)
-        pages = loader.load()
+        pattern = keyword_filter
+        if isinstance(keyword_filter, list):
+            pattern = re.compile("|".join(map(re.escape, keyword_filter)), re.IGNORECASE) if keyword_filter else None
         
         splitter = RecursiveCharacterTextSplitter(
             chunk_size=self.chunk_size,
             chunk_overlap=self.chunk_overlap
         )
         
-        chunks = splitter.split_documents(pages)
-        print(f"✅ Created {len(chunks)} chunks from {len(pages)} pages.")
+        pdf = pdfium.PdfDocument(pdf_path)
+        n_pages = len(pdf)
+        workers = min(os.cpu_count() or 1, n_pages // PAGES_PER_WORKER)
+        
+        # Page extraction is CPU-bound with no cross-page dependency: fan out over processes
+        # (PDFium calls don't reliably release the GIL, so threads wouldn't help)
+        if n_pages < PARALLEL_MIN_PAGES or workers < 2:
+            try:
+                pages = [(i, _page_text(pdf, i)) for i in range(n_pages)]
+            finally:
+                pdf.close()
+        else:
+            pdf.close()
+            # spawn: don't fork a parent that already has PDFium state loaded
+            with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+                pages = list(pool.map(
+                    _extract_page, repeat(pdf_path), range(n_pages),
+                    chunksize=-(-n_pages // workers)  # one contiguous block per worker
+                ))  # map() preserves page order
+        
+        if pattern is not None:
+            pages = [(i, text) for i, text in pages if pattern.search(text)]
+        
+        chunks = splitter.create_documents(
+            [text for _, text in pages],
+            metadatas=[{"source": pdf_path, "page": i} for i, _ in pages]
+        )
+        
+        print(f"✅ Created {len(chunks)} chunks from {n_pages} pages.")
         
         # Convert to list of dicts for easier handling/serialization later
         return [{"text": c.page_content, "metadata": c.metadata} for c in chunks]
@@ -58,6 +131,8 @@ class IngestionEngine:
         """
         DataWeave-style: Uses an LLM Agent to parse the text into the strictly defined Pydantic Schema.
         """
+        from langchain_core.prompts import ChatPromptTemplate
+
         system_prompt = """
         You are an Expert ESG Auditor. Your task is to extract specifics for 'Principle 6' (Environmental Responsibilities) 
         from the provided Corporate BRSR Report text.
@@ -78,17 +153,41 @@ class IngestionEngine:
             ("human", "Analyze the following text and extract Principle 6 data:\n\n{text}")
         ])
         
+        # Keyed on model + full prompt (system and human templates) + schema + input,
+        # so prompt or schema edits invalidate stale entries
+        schema_json = json.dumps(Principle6Schema.model_json_schema(), sort_keys=True)
+        key = hashlib.sha256((self.model_name + prompt.pretty_repr() + schema_json + text_context).encode("utf-8")).hexdigest()
+        cache_path = self.cache_dir / f"{key}.json"
+        if cache_path.exists():
+            try:
+                cached = Principle6Schema.model_validate_json(cache_path.read_text(encoding="utf-8"))
+                print("♻️ Using cached extraction.")
+                return cached
+            except (OSError, ValidationError) as e:
+                print(f"⚠️ Warning: Ignoring unreadable extraction cache entry: {e}")
+        
         chain = prompt | self.extractor
         
         print("🤖 Running Extraction Agent...")
         try:
             result = chain.invoke({"text": text_context})
-            return result
         except Exception as e:
             print(f"❌ Extraction Failed: {e}")
             return Principle6Schema() # Return empty schema on fail
+        
+        # A failed cache write must not discard a successful (paid-for) extraction
+        try:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            cache_path.write_text(result.model_dump_json(), encoding="utf-8")
+        except OSError as e:
+            print(f"⚠️ Warning: Could not write extraction cache: {e}")
+        return result
 
 if __name__ == "__main__":
+    from dotenv import load_dotenv
+
+    load_dotenv()
+
     # Test run
     engine = IngestionEngine()
     # Note: efficient testing would typically just load a few pages or a specific section
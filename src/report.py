@@ -1,17 +1,29 @@
+import argparse
 import os
-import pandas as pd
-import plotly.graph_objects as go
-from docx import Document
-from docx.shared import Inches, Pt, RGBColor
-from docx.enum.text import WD_ALIGN_PARAGRAPH
-from dotenv import load_dotenv
+import re
+from datetime import datetime
 
 from src.ingest import IngestionEngine
 from src.eval import EvaluationEngine
 
-load_dotenv()
+# Page-level filter for Principle 6 content (covers "Scope 1/2/3" variants).
+# Compiled once: a single case-insensitive pass per page, no lowercased copies.
+_KW = re.compile(r'principle\s*6|emissions?|water|waste|scope\s*[123]|ghg|co2', re.IGNORECASE)
+
+# Drift score -> (justification template, RGB for the score cell)
+# In a real system, the justification would come from the NLI model's explanation or the snippet metadata.
+# Here we construct it based on the logic.
+_STRONG = ("STRONG EVIDENCE: Disclosure explicitly cites quantitative data (e.g., {claim}...) matching the requirement unit.", (0, 255, 0))  # Green
+_PARTIAL = ("PARTIAL EVIDENCE: Data reported but may lack specific granularity or unit alignment.", (255, 165, 0))  # Orange
+_WEAK = ("WEAK/MISSING: No clear evidence found supporting this requirement.", (255, 0, 0))  # Red
+_DRIFT_STYLE = {0: _STRONG, 1: _WEAK, 2: _PARTIAL, 3: _WEAK}
+
+def generate_report(interactive: bool = False):
+    import plotly.graph_objects as go
+    from docx import Document
+    from docx.shared import Inches, RGBColor
+    from docx.enum.text import WD_ALIGN_PARAGRAPH
 
-def generate_report():
     print("🚀 Generating Faithfulness Audit Report...")
     
     # 1. Setup Engines
@@ -25,8 +37,8 @@ def generate_report():
         return
 
     print("📄 Ingesting & Extracting...")
-    chunks = ingestor.load_and_chunk(pdf_path)
-    relevant_text = "\n".join([c['text'] for c in chunks if "Principle 6" in c['text'] or "emissions" in c['text'].lower() or "water" in c['text'].lower()])
+    chunks = ingestor.load_and_chunk(pdf_path, keyword_filter=_KW)
+    relevant_text = "\n".join(c['text'] for c in chunks)
     data = ingestor.extract_principle_6(relevant_text[:40000])
     
     # 3. Define Ground Truth
@@ -51,14 +63,14 @@ def generate_report():
     
     doc.add_paragraph('Target Company: Wipro Limited')
     doc.add_paragraph('Focus Area: Principle 6 (Environmental Responsibilities)')
-    doc.add_paragraph(f'Report Generated: {pd.Timestamp.now().strftime("%Y-%m-%d %H:%M")}')
+    doc.add_paragraph(f'Report Generated: {datetime.now().strftime("%Y-%m-%d %H:%M")}')
     
     # Code Repository Link
     doc.add_heading('Code Repository & Notebooks', level=2)
-    doc.add_paragraph(
+    # Sankey line is appended once we know whether the PNG export succeeded (Section 4)
+    repo_para = doc.add_paragraph(
         "📁 Full Project Code: [Upload to GitHub and add link here]\n"
         "📓 Interactive Analysis: See notebooks/02_analysis.ipynb for Sankey diagram and pipeline execution\n"
-        "📊 Sankey Visualization: output/sankey_diagram.html (interactive HTML)"
     )
     
     doc.add_paragraph('_' * 40)
@@ -87,32 +99,30 @@ def generate_report():
     #     cell.width = Inches(1.5)
 
     print("🔍 Evaluating & Justifying...")
-    for item in sebi_requirements:
+    # Single batched NLI pass over all requirements (reused by the Sankey below)
+    pairs = [(item['req'], claims_map.get(item['cat'], "Not Found")) for item in sebi_requirements]
+    results = {}
+
+    eval_results = evaluator.calculate_drift_batch(pairs)
+    
+    # Append all rows in one pass, then fill their text
+    all_row_cells = [table.add_row().cells for _ in sebi_requirements]
+    
+    for item, eval_res, row_cells in zip(sebi_requirements, eval_results, all_row_cells):
         cat = item['cat']
         req_text = item['req']
         claim_text = claims_map.get(cat, "Not Found")
         
-        # Eval
-        eval_res = evaluator.calculate_drift(req_text, claim_text)
+        # Keep score + Sankey label so the diagram below is pure lookups
+        eval_res['d_lbl'] = f"Disc: {claim_text[:20]}..."
+        results[cat] = eval_res
         score = eval_res['drift_score']
         label = eval_res['label']
         
-        # Generate Justification (Non-hallucination proof)
-        # In a real system, this would come from the NLI model's explanation or the snippet metadata.
-        # Here we construct it based on the logic.
-        if score == 0:
-            justification = f"STRONG EVIDENCE: Disclosure explicitly cites quantitative data (e.g., {claim_text[:15]}...) matching the requirement unit."
-            color = RGBColor(0, 255, 0) # Green
-        elif score == 2:
-            justification = "PARTIAL EVIDENCE: Data reported but may lack specific granularity or unit alignment."
-            color = RGBColor(255, 165, 0) # Orange
-        else:
-            justification = "WEAK/MISSING: No clear evidence found supporting this requirement."
-            color = RGBColor(255, 0, 0) # Red
-            
+        # Generate Justification (Non-hallucination proof) from the drift-score table
+        just_template, rgb = _DRIFT_STYLE[score]
+        justification = just_template.format(claim=claim_text[:15])
         
-        # Add Row
-        row_cells = table.add_row().cells
         row_cells[0].text = cat
         row_cells[1].text = req_text
         row_cells[2].text = claim_text
@@ -124,7 +134,7 @@ def generate_report():
         # or we can try setting the shading if we want background color. 
         # Let's stick to text color + bold for reliability.
         run = row_cells[4].paragraphs[0].runs[0]
-        run.font.color.rgb = color
+        run.font.color.rgb = RGBColor(*rgb)
         run.font.bold = True
 
     doc.add_paragraph('\n*Drift Key: 0=Green (Faithful), 3=Red (Drift)*')
@@ -143,59 +153,33 @@ def generate_report():
     doc.add_paragraph("Visual representation of SEBI Requirements → Company Disclosures → Drift Scores:")
     
     # Generate Sankey Data
-    labels = []
-    sources = []
-    targets = []
-    values = []
-    
-    req_indices = {}
-    disc_indices = {}
-    score_indices = {}
-    current_idx = 0
+    # Node label -> index (insertion-ordered dict: O(1) dedupe instead of scanning a list)
+    idx_of = {}
+    def add(lbl):
+        return idx_of.setdefault(lbl, len(idx_of))
     
-    # Build nodes
+    # Build nodes: requirements, then disclosures, then all drift buckets
     for item in sebi_requirements:
-        lbl = f"Req: {item['cat']}"
-        if lbl not in labels:
-            labels.append(lbl)
-            req_indices[lbl] = current_idx
-            current_idx += 1
-    
+        add(f"Req: {item['cat']}")
     for item in sebi_requirements:
-        cat = item['cat']
-        claim = claims_map.get(cat, "Not Found")
-        lbl = f"Disc: {claim[:20]}..."
-        if lbl not in labels:
-            labels.append(lbl)
-            disc_indices[lbl] = current_idx
-            current_idx += 1
-    
+        add(results[item['cat']]['d_lbl'])
     for s in [0, 1, 2, 3]:
-        lbl = f"Drift: {s}"
-        labels.append(lbl)
-        score_indices[lbl] = current_idx
-        current_idx += 1
+        add(f"Drift: {s}")
+    labels = list(idx_of)
     
-    # Build links (re-evaluate to get scores)
+    # Build links (scores from the dashboard pass)
+    sources = []
+    targets = []
+    values = []
     for item in sebi_requirements:
-        cat = item['cat']
-        req_text = item['req']
-        claim_text = claims_map.get(cat, "Not Found")
-        
-        eval_res = evaluator.calculate_drift(req_text, claim_text)
-        score = eval_res['drift_score']
-        
-        r_lbl = f"Req: {cat}"
-        d_lbl = f"Disc: {claim_text[:20]}..."
-        s_lbl = f"Drift: {score}"
+        res = results[item['cat']]
+        req_idx = idx_of[f"Req: {item['cat']}"]
+        disc_idx = idx_of[res['d_lbl']]
+        score_idx = idx_of[f"Drift: {res['drift_score']}"]
         
-        sources.append(req_indices[r_lbl])
-        targets.append(disc_indices[d_lbl])
-        values.append(1)
-        
-        sources.append(disc_indices[d_lbl])
-        targets.append(score_indices[s_lbl])
-        values.append(1)
+        sources += [req_idx, disc_idx]
+        targets += [disc_idx, score_idx]
+        values += [1, 1]
     
     # Create Sankey
     fig = go.Figure(data=[go.Sankey(
@@ -214,15 +198,34 @@ def generate_report():
     
     fig.update_layout(title_text="BRSR Faithfulness Audit Flow", font_size=10, width=1200, height=600)
     
-    # Export as HTML (interactive)
-    sankey_html_path = "output/sankey_diagram.html"
-    fig.write_html(sankey_html_path)
+    os.makedirs("output", exist_ok=True)
     
-    # Add instruction to document
-    doc.add_paragraph(
-        f"📊 Interactive Sankey diagram has been saved to: {sankey_html_path}\n"
-        "To view: Open the HTML file in your browser. To embed in this document: Take a screenshot and insert manually."
-    )
+    # Static PNG embedded straight into the report (no manual screenshot step)
+    sankey_png_path = "output/sankey_diagram.png"
+    png_embedded = False
+    try:
+        fig.write_image(sankey_png_path, engine="kaleido", width=1200, height=600, scale=2)
+        doc.add_picture(sankey_png_path, width=Inches(6.5))
+        png_embedded = True
+    except Exception as e:
+        print(f"⚠️ Warning: Static Sankey export failed (Check kaleido install): {e}")
+        interactive = True  # Fall back to HTML so the diagram isn't lost
+    
+    # Export as HTML (interactive) only when asked for - it bundles the full plotly.js
+    if interactive:
+        sankey_html_path = "output/sankey_diagram.html"
+        fig.write_html(sankey_html_path)
+        doc.add_paragraph(
+            f"📊 Interactive Sankey diagram has been saved to: {sankey_html_path}\n"
+            "To view: Open the HTML file in your browser."
+        )
+    
+    if png_embedded and interactive:
+        repo_para.add_run(f"📊 Sankey Visualization: embedded in Section 4 (interactive HTML: {sankey_html_path})")
+    elif png_embedded:
+        repo_para.add_run("📊 Sankey Visualization: embedded in Section 4 (interactive HTML via: python -m src.report --interactive)")
+    else:
+        repo_para.add_run(f"📊 Sankey Visualization: {sankey_html_path} (interactive HTML)")
     
     # 5. AI / RAG Concepts Employed (Assignment Requirement)
     doc.add_heading('5. AI & RAG Concepts Employed', level=1)
@@ -248,12 +251,16 @@ def generate_report():
         p.add_run(desc)
 
     # Save
-    if not os.path.exists("output"):
-        os.makedirs("output")
-        
     output_path = "output/BRSR_Faithfulness_Audit_SUBMISSION.docx"
     doc.save(output_path)
     print(f"✅ Report saved to: {output_path}")
 
 if __name__ == "__main__":
-    generate_report()
+    from dotenv import load_dotenv
+
+    load_dotenv()
+
+    parser = argparse.ArgumentParser(description="Generate the BRSR Faithfulness Audit report.")
+    parser.add_argument("--interactive", action="store_true", help="Also export the Sankey diagram as interactive HTML.")
+    args = parser.parse_args()
+    generate_report(interactive=args.interactive)